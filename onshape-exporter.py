@@ -3,144 +3,478 @@
 import requests
 import os
 import time
-import base64
+import atexit
+import logging
+import logging.handlers
+import queue
+import threading
+import shutil
+import json
+import hashlib
 import sys
 import argparse
 import yaml
-from urllib.parse import quote
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import contextlib
+import functools
+import re
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from itertools import product
 from datetime import datetime
 
-def log(msg, verbosity=1, level=1):
+# libyaml's C loader is much faster than the pure-Python one on large configuration files
+try:
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:
+    from yaml import SafeLoader as YamlLoader
+
+# orjson parses the (sometimes large) API responses considerably faster; fall back to the stdlib if it is missing
+try:
+    import orjson
+    _loads = orjson.loads
+    _dumps = orjson.dumps
+except ImportError:
+    _loads = json.loads
+    _dumps = json.dumps
+
+API_BASE = "https://cad.onshape.com/api"
+# document URL: /documents/<did>[/w/<wid>][/v/<vid>][/m/<mid>]/e/<eid>, with at least one of w, v, m
+_ONSHAPE_URL_RE = re.compile(
+    r"/documents/(?P<did>[^/?#]+)(?:/w/(?P<wid>[^/?#]+))?(?:/v/(?P<vid>[^/?#]+))?(?:/m/(?P<mid>[^/?#]+))?"
+    r"/e/(?P<eid>[^/?#]+)")
+# a quantity given as a string: a number followed by one of the supported units
+_UNITS = ("mm", "cm", "in", "m", "ft")
+_UNIT_RE = re.compile(rf'^\s*([-+]?(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][-+]?\d+)?)\s*({"|".join(_UNITS)})\s*$')
+# default number of exports that run concurrently (--jobs); the HTTP connection pool is sized to match
+MAX_WORKERS = 10
+# how long a cached configuration schema stays valid, in seconds
+SCHEMA_CACHE_TTL = 24 * 60 * 60
+# how long parsed responses of read-only endpoints are reused within a run, in seconds
+JSON_CACHE_TTL = 300
+# the version list is fetched in pages of this size until the wanted version is found
+VERSIONS_PAGE_SIZE = 100
+# translation polling starts fast for short jobs and backs off for long ones
+POLL_INITIAL_DELAY = 0.5
+POLL_MAX_DELAY = 10.0
+POLL_BACKOFF = 1.7
+# adaptive limit on concurrent API calls: grow while responses are fast, halve on rate limiting or slow responses
+ADMISSION_MIN = 1
+ADMISSION_MAX = 32
+ADMISSION_TARGET_LATENCY = 1.5
+ADMISSION_WINDOW = 32
+ADMISSION_INCREASE = 0.5
+ADMISSION_DECREASE = 0.5
+# pause new calls when fewer than this fraction of the rate limit is left
+RATE_LIMIT_RESERVE = 0.1
+RATE_LIMIT_PAUSE = 1.0
+
+logger = logging.getLogger("onshape-exporter")
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    # the stock prepare() formats the message on the calling thread; leave that to the listener
+    def prepare(self, record):
+        return record
+
+def setup_logging():
+    # the export threads only put records on a queue; formatting and the (possibly slow) terminal
+    # writes happen on the listener thread, which is why the log calls pass %-style arguments rather
+    # than pre-formatted strings
+    out = logging.StreamHandler(sys.stdout)
+    out.addFilter(lambda record: record.levelno < logging.ERROR)
+    err = logging.StreamHandler(sys.stderr)
+    err.setLevel(logging.ERROR)
+    err.setFormatter(logging.Formatter("[%(asctime)s] ERROR: %(message)s", datefmt="%Y-%m-%dT%H:%M:%S"))
+    log_queue = queue.Queue(-1)
+    listener = logging.handlers.QueueListener(log_queue, out, err, respect_handler_level=True)
+    logger.addHandler(_DeferredQueueHandler(log_queue))
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    listener.start()
+    atexit.register(listener.stop)
+
+def log(msg, *args, verbosity=1, level=1):
     if verbosity >= level:
-        print(msg)
-
-def log_error(msg):
-    sys.stderr.write(f"[{datetime.now().isoformat()}] ERROR: {msg}\n")
+        logger.info(msg, *args)
+
+def log_error(msg, *args):
+    logger.error(msg, *args)
+
+class AdmissionController:
+    # AIMD limit on the number of API calls in flight: additive increase while the mean latency of the
+    # recent calls stays below the target, multiplicative decrease on 429/502/503 or slow responses
+    def __init__(self, initial):
+        self.limit = float(min(max(initial, ADMISSION_MIN), ADMISSION_MAX))
+        self.in_flight = 0
+        self.latencies = deque(maxlen=ADMISSION_WINDOW)
+        self.paused_until = 0.0
+        self.cond = threading.Condition()
+
+    def acquire(self):
+        with self.cond:
+            while self.in_flight >= int(self.limit):
+                self.cond.wait()
+            self.in_flight += 1
+            pause = self.paused_until - time.monotonic()
+        if pause > 0:
+            time.sleep(pause)
+
+    def release(self, latency, congested=False):
+        with self.cond:
+            self.in_flight -= 1
+            self.latencies.append(latency)
+            # after a decrease, wait for a few fresh samples before judging the latency again
+            slow = len(self.latencies) >= 4 and sum(self.latencies) / len(self.latencies) > ADMISSION_TARGET_LATENCY
+            if congested or slow:
+                self.limit = max(ADMISSION_MIN, self.limit * ADMISSION_DECREASE)
+                self.latencies.clear()
+            else:
+                self.limit = min(ADMISSION_MAX, self.limit + ADMISSION_INCREASE)
+            self.cond.notify_all()
+
+    def pause(self, seconds):
+        with self.cond:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+class TranslationSupervisor:
+    # a single background thread polls all outstanding translations on every tick, instead of every export
+    # running its own polling loop; exports register their translation id and wait on the returned Future
+    def __init__(self, ctx):
+        self.ctx = ctx
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.thread = None
+        self.new_work = False
+
+    def submit(self, TID, label=None):
+        future = Future()
+        with self.lock:
+            self.pending[TID] = (future, label)
+            self.new_work = True
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="translation-poller", daemon=True)
+                self.thread.start()
+        return future
+
+    def _run(self):
+        delay = POLL_INITIAL_DELAY
+        while True:
+            with self.lock:
+                if not self.pending:
+                    self.thread = None
+                    return
+                if self.new_work:
+                    # check new translations soon, they may be quick ones
+                    delay = POLL_INITIAL_DELAY
+                    self.new_work = False
+                outstanding = list(self.pending.items())
+            retry_after = None
+            for TID, (future, label) in outstanding:
+                try:
+                    done, retry = self._poll(TID, future, label)
+                except Exception as e:
+                    future.set_exception(e)
+                    done, retry = True, None
+                if done:
+                    with self.lock:
+                        del self.pending[TID]
+                if retry:
+                    retry_after = max(retry_after or 0, retry)
+            # the server may ask us to slow down; otherwise keep backing off
+            if self.ctx.cancelled.wait(retry_after or delay):
+                with self.lock:
+                    abandoned, self.pending, self.thread = self.pending, {}, None
+                for TID, (future, label) in abandoned.items():
+                    future.set_exception(RuntimeError(f"Translation {TID} abandoned, the run was cancelled"))
+                return
+            delay = min(delay * POLL_BACKOFF, POLL_MAX_DELAY)
+
+    def _poll(self, TID, future, label):
+        http_response = get_onshape_direct(self.ctx, f"{API_BASE}/translations/{TID}")
+        response = _loads(http_response.content)
+        log("Translation status (%s): %s", label or TID, response['requestState'], verbosity=self.ctx.verbosity, level=2)
+        if response["requestState"] == "DONE":
+            future.set_result(response)
+            return True, None
+        if response["requestState"] == "FAILED":
+            future.set_exception(RuntimeError(f"Translation {TID} failed: {response.get('failureReason', 'unknown reason')}"))
+            return True, None
+        return False, _retry_after(http_response)
 
 class Context:
-    def __init__(self, access, secret, ids, verbosity=1):
-        self.auth = (access, secret)
+    def __init__(self, access, secret, ids, verbosity=1, refresh_schema=False, workers=MAX_WORKERS, cache_dir=None):
         self.ids = ids
+        # the document ids don't change during a run, so the endpoint URLs are formatted once
+        doc = f"d/{ids['did']}"
+        wvm = f"{ids['wvm']}/{ids['wvmid']}"
+        self.url_config = f"{API_BASE}/elements/{doc}/{wvm}/e/{ids['eid']}/configuration"
+        self.url_parts = f"{API_BASE}/parts/{doc}/{wvm}/e/{ids['eid']}"
+        self.url_encode = f"{API_BASE}/elements/{doc}/e/{ids['eid']}/configurationencodings"
+        self.url_translate = f"{API_BASE}/partstudios/{doc}/{wvm}/e/{ids['eid']}/translations"
+        self.url_versions = f"{API_BASE}/documents/{doc}/versions"
+        self.url_externaldata = f"{API_BASE}/documents/{doc}/externaldata"
         self.verbosity = verbosity
+        self.refresh_schema = refresh_schema
+        # on-disk cache of schemas and exported files; None disables it
+        self.cache_dir = cache_dir
+        self.workers = workers
+        # set to abandon the run; the polling loops wait on it instead of sleeping so they stop right away
+        self.cancelled = threading.Event()
+        self.admission = AdmissionController(workers)
+        # url -> (expiry, parsed JSON) for the read-only endpoints fetched with get_onshape_json(..., cache=True)
+        self.json_cache = {}
+        self.json_cache_lock = threading.Lock()
+        # serialized encoding request body -> Future of (encodedId, queryParam), also guarded by json_cache_lock
+        self.encode_cache = {}
+        self.supervisor = TranslationSupervisor(self)
+        # one session for the whole run so that the TCP+TLS connections to cad.onshape.com are kept alive
+        # and pooled instead of being set up again for every API call
+        self.session = requests.Session()
+        self.session.auth = (access, secret)
+        self.session.headers.update({"Accept": "application/json"})
+        # rate limiting (429) and gateway errors are retried with backoff, honouring Retry-After
+        retry = Retry(total=5, backoff_factor=0.5, status_forcelist=[429, 502, 503, 504],
+                      allowed_methods=frozenset(["GET", "POST"]), respect_retry_after_header=True)
+        # pool_block makes concurrent exports wait for a pooled keep-alive connection instead of opening
+        # extra short-lived ones that are discarded after a single request
+        self.session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=max(16, workers),
+                                                   pool_block=True, max_retries=retry))
+
+def _retry_after(response):
+    # seconds the server asked us to wait, if it sent a numeric Retry-After header
+    try:
+        return float(response.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return None
 
-def parse_onshape_path(ids, template):
-    return f"https://cad.onshape.com/api{template.format(
-        did=ids['did'],
-        eid=ids['eid'],
-        wv=ids['wvm'],
-        wvm=ids['wvm'],
-        wvid=ids['wvmid'],
-        wvmid=ids['wvmid'],
-        wid=ids.get('wid'),
-        vid=ids.get('vid'),
-        mid=ids.get('mid')
-    )}"
-
-def get_onshape_direct(ctx, url, headers=None):
-    response = requests.get(
-        url,
-        auth=ctx.auth,
-        headers=headers or {"Accept": "application/json"}
-    )
-    response.raise_for_status()
+def _check_rate_limit(ctx, response):
+    try:
+        remaining = int(response.headers["X-RateLimit-Remaining"])
+        limit = int(response.headers["X-RateLimit-Limit"])
+    except (KeyError, ValueError):
+        return
+    if remaining < limit * RATE_LIMIT_RESERVE:
+        ctx.admission.pause(_retry_after(response) or RATE_LIMIT_PAUSE)
+
+def _request(ctx, method, url, **kwargs):
+    # all API calls go through here so that they are admitted by the concurrency controller, and so that
+    # failures carry the start of the response body, which is where Onshape explains what went wrong
+    ctx.admission.acquire()
+    start = time.monotonic()
+    congested = False
+    try:
+        response = ctx.session.request(method, url, **kwargs)
+        # the session retries 429/502/503 itself, so the congestion shows in the retry history, not the status
+        retries = getattr(response.raw, "retries", None)
+        congested = any(entry.status in (429, 502, 503) for entry in (retries.history if retries else ()))
+        _check_rate_limit(ctx, response)
+    except requests.exceptions.RetryError:
+        # the session gave up retrying 429/5xx responses
+        congested = True
+        raise
+    finally:
+        ctx.admission.release(time.monotonic() - start, congested)
+    if response.status_code >= 400:
+        body = response.text[:500]
+        response.close()
+        raise requests.HTTPError(f"{method} {url} -> {response.status_code}: {body}", response=response)
     return response
 
-def get_onshape_json(ctx, path_template):
-    url = parse_onshape_path(ctx.ids, path_template)
-    return get_onshape_direct(ctx, url).json()
-
-def post_onshape_json(ctx, path_template, json_payload):
-    url = parse_onshape_path(ctx.ids, path_template)
-    response = requests.post(
+def get_onshape_direct(ctx, url, headers=None, stream=False):
+    return _request(ctx, "GET", url, headers=headers, stream=stream)
+
+def get_onshape_json(ctx, url, cache=False):
+    if not cache:
+        return _loads(get_onshape_direct(ctx, url).content)
+    now = time.monotonic()
+    with ctx.json_cache_lock:
+        hit = ctx.json_cache.get(url)
+    if hit and hit[0] > now:
+        return hit[1]
+    data = _loads(get_onshape_direct(ctx, url).content)
+    with ctx.json_cache_lock:
+        ctx.json_cache[url] = (now + JSON_CACHE_TTL, data)
+    return data
+
+def post_onshape_json(ctx, url, json_payload=None, body=None):
+    # callers that already hold the serialized payload pass it as body to skip serializing it again
+    if body is None:
+        body = _dumps(json_payload)
+    response = _request(
+        ctx,
+        "POST",
         url,
-        auth=ctx.auth,
         headers={
             "Accept": "application/json;charset=UTF-8; qs=0.09",
             "Content-Type": "application/json"
         },
-        json=json_payload
+        data=body
     )
-    response.raise_for_status()
-    return response.json()
+    return _loads(response.content)
 
 def load_api_keys(path, stack_override=None):
     if path == "-":
         try:
-            data = yaml.safe_load(sys.stdin)
+            data = yaml.load(sys.stdin, Loader=YamlLoader)
             return data['access'], data['secret']
         except yaml.YAMLError as e:
-            log_error(f"Failed to parse API key data from stdin: {e}")
+            log_error("Failed to parse API key data from stdin: %s", e)
             sys.exit(1)
         except KeyError:
             log_error("API key data must contain 'access' and 'secret' fields.")
             sys.exit(1)
     try:
         with open(path) as f:
-            config = yaml.safe_load(f)
+            config = yaml.load(f, Loader=YamlLoader)
             default_stack = stack_override or config.get("default_stack")
             if not default_stack:
                 log_error("YAML config must include a 'default_stack' key.")
                 sys.exit(1)
             profile = config.get(default_stack)
             if not profile:
-                log_error(f"Profile '{default_stack}' not found in the config file.")
+                log_error("Profile '%s' not found in the config file.", default_stack)
                 sys.exit(1)
             return profile["access_key"], profile["secret_key"]
     except Exception as e:
-        log_error(f"Failed to load YAML API key file '{path}': {e}")
+        log_error("Failed to load YAML API key file '%s': %s", path, e)
         sys.exit(1)
 
 
 
+@functools.lru_cache(maxsize=None)
 def get_ids(url):
-    urlArr = url.split("/")
-    dIndex = urlArr.index("documents")
-    DID = urlArr[dIndex + 1]
-    eIndex = urlArr.index("e")
-    EID = urlArr[eIndex + 1]
-
-    WID = VID = MID = None
-    if "w" in urlArr:
-        WID = urlArr[urlArr.index("w") + 1]
-    if "v" in urlArr:
-        VID = urlArr[urlArr.index("v") + 1]
-    if "m" in urlArr:
-        MID = urlArr[urlArr.index("m") + 1]
-
-    if MID:
-        WVMID = MID
-        WVM = "m"
-    elif VID:
-        WVMID = VID
-        WVM = "v"
-    elif WID:
-        WVMID = WID
-        WVM = "w"
-    else:
+    match = _ONSHAPE_URL_RE.search(url)
+    if not match:
+        raise ValueError("URL must contain the document and element IDs")
+    ids = match.groupdict()
+    # a microversion is the most specific reference, then a version, then a workspace
+    ids['wvm'] = next((wvm for wvm in ("m", "v", "w") if ids[f"{wvm}id"]), None)
+    if ids['wvm'] is None:
         raise ValueError("URL must contain 'w', 'v', or 'm'")
+    ids['wvmid'] = ids[f"{ids['wvm']}id"]
+    return ids
 
-    return {
-        'did': DID,
-        'eid': EID,
-        'wid': WID,
-        'vid': VID,
-        'mid': MID,
-        'wvmid': WVMID,
-        'wvm': WVM
-    }
 
+def _cacheable(ctx):
+    # only versions and microversions are immutable; a workspace can change at any time
+    return ctx.cache_dir is not None and ctx.ids['wvm'] in ("v", "m")
 
 
+def _schema_cache_path(ctx):
+    if not _cacheable(ctx):
+        return None
+    ids = ctx.ids
+    return os.path.join(ctx.cache_dir, f"schema-{ids['did']}-{ids['eid']}-{ids['wvmid']}.json")
+
+
+def _read_cached_schema(ctx, cache_path):
+    # a missing, stale or unreadable cache file is just a cache miss
+    if not cache_path or ctx.refresh_schema:
+        return None
+    try:
+        if time.time() - os.path.getmtime(cache_path) >= SCHEMA_CACHE_TTL:
+            return None
+        with open(cache_path) as f:
+            response = json.load(f)
+    except (OSError, ValueError):
+        return None
+    log("Using cached configuration schema %s", cache_path, verbosity=ctx.verbosity, level=2)
+    return response
+
+
+def _write_cached_schema(cache_path, response):
+    # written to a temporary file and moved into place, so an interrupted or concurrent run never leaves a
+    # truncated schema behind
+    partial = f"{cache_path}.{os.getpid()}.part"
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(partial, 'w') as f:
+            json.dump(response, f)
+        os.replace(partial, cache_path)
+    except OSError as e:
+        with contextlib.suppress(OSError):
+            os.remove(partial)
+        log_error("Failed to cache the configuration schema: %s", e)
+
 
 def get_element_configuration(ctx):
-    response = get_onshape_json(ctx, "/elements/d/{did}/{wvm}/{wvmid}/e/{eid}/configuration")
-    #get the config in a format that has the UI-visible name as key and the "message" as value
+    cache_path = _schema_cache_path(ctx)
+    response = _read_cached_schema(ctx, cache_path)
+    if response is None:
+        response = get_onshape_json(ctx, ctx.url_config, cache=True)
+        if cache_path:
+            _write_cached_schema(cache_path, response)
+    #get the config in a format that has the UI-visible name as key and the "message" as value, and
+    #precompute the lookups resolve_configuration_parameters needs, so callers only ever see the compiled form
     config_schema = {p["message"]["parameterName"]: p for p in response["configurationParameters"]}
-    return config_schema
+    return compile_schema(config_schema)
+
+
+def _resolve_enum(name, entry, value):
+    valid_options = entry["options"]
+    if value not in valid_options:
+        raise ValueError(f"Invalid value '{value}' for enum '{name}'. Valid options: {list(valid_options.keys())}")
+    return valid_options[value]
+
+
+def _resolve_quantity(name, entry, value):
+    if isinstance(value, str):
+        match = _UNIT_RE.match(value)
+        if not match:
+            raise ValueError(f"Value '{value}' for quantity '{name}' must be a number followed by a supported unit")
+        numeric_value = float(match.group(1))
+        # always send the canonical "<number> <unit>" form, whatever spacing was used in the configuration
+        resolved_value = f"{match.group(1)} {match.group(2)}"
+    elif isinstance(value, (int, float)):
+        numeric_value = value
+        resolved_value = f"{value}{entry['unit']}"
+    else:
+        raise ValueError(f"Value '{value}' for quantity '{name}' must be a number or string with units")
+
+    if entry["min"] is not None and numeric_value < entry["min"]:
+        raise ValueError(f"Value {value} for '{name}' is below minimum {entry['min']}")
+    if entry["max"] is not None and numeric_value > entry["max"]:
+        raise ValueError(f"Value {value} for '{name}' exceeds maximum {entry['max']}")
+    return resolved_value
+
+
+def _resolve_boolean(name, entry, value):
+    if not isinstance(value, bool):
+        raise ValueError(f"Value for boolean '{name}' must be true or false")
+    return value
+
+
+# validator/converter for each supported parameter type, bound to the parameters by compile_schema
+_RESOLVERS = {
+    "BTMConfigurationParameterEnum": _resolve_enum,
+    "BTMConfigurationParameterQuantity": _resolve_quantity,
+    "BTMConfigurationParameterBoolean": _resolve_boolean,
+}
+
+
+def compile_schema(config_schema):
+    #Derive everything resolve_configuration_parameters needs from the raw schema once per run, instead of
+    #rebuilding the option maps and range values for every parameter of every export
+    compiled = {}
+    for name, param in config_schema.items():
+        message = param["message"]
+        entry = {"param_id": message["parameterId"], "type": param.get("typeName")}
+        entry["resolve"] = _RESOLVERS.get(entry["type"])
+        if entry["type"] == "BTMConfigurationParameterEnum":
+            entry["options"] = {opt["message"]["optionName"]: opt["message"]["option"] for opt in message["options"]}
+        elif entry["type"] == "BTMConfigurationParameterQuantity":
+            range_info = message.get("rangeAndDefault", {}).get("message", {})
+            min_val = range_info.get("minValue")
+            max_val = range_info.get("maxValue")
+            entry["min"] = float(min_val) if min_val is not None else None
+            entry["max"] = float(max_val) if max_val is not None else None
+            entry["unit"] = f" {range_info['units']}" if range_info.get("units") else ""
+        compiled[name] = entry
+    return compiled
 
 
-def resolve_configuration_parameters(config, config_schema):
+def resolve_configuration_parameters(config, compiled_schema):
     #Convert UI values into internal identifiers. "config" is a json formatted representation of the UI-visible
     #configuration values:
     # {
@@ -157,55 +491,16 @@ def resolve_configuration_parameters(config, config_schema):
     resolved_params = []
     for conf_param_name, conf_value in config.items():
         # check that the UI -visible name is in the schema a key
-        if conf_param_name not in config_schema:
+        entry = compiled_schema.get(conf_param_name)
+        if entry is None:
             raise ValueError(f"Unknown configuration parameter: '{conf_param_name}'")
+        if entry["resolve"] is None:
+            raise ValueError(f"Unsupported parameter type '{entry['type']}' for parameter '{conf_param_name}'")
 
-        conf_param_def = config_schema[conf_param_name]["message"]
-        param_id = conf_param_def["parameterId"]
-        conf_param_type = config_schema[conf_param_name].get("typeName")
- 
-        if conf_param_type == "BTMConfigurationParameterEnum":
-            valid_options = {opt["message"]["optionName"]: opt["message"]["option"] for opt in conf_param_def["options"]}
-            if conf_value not in valid_options:
-                raise ValueError(f"Invalid value '{conf_value}' for enum '{conf_param_name}'. Valid options: {list(valid_options.keys())}")
-            resolved_value = valid_options[conf_value]
-
-        elif conf_param_type == "BTMConfigurationParameterQuantity":
-            range_info = conf_param_def.get("rangeAndDefault", {}).get("message", {})
-            min_val = range_info.get("minValue")
-            max_val = range_info.get("maxValue")
-            unit_raw = range_info.get("units")
-            default_unit = f" {unit_raw}" if unit_raw else ""
-            
-            if isinstance(conf_value, str):
-                if not any(conf_value.endswith(unit) for unit in (" mm", "cm", "in", "m", "ft")):
-                    raise ValueError(f"Value '{conf_value}' for quantity '{conf_param_name}' must end with a supported unit")
-                try:
-                    numeric_value = float(conf_value.split()[0])
-                except ValueError:
-                    raise ValueError(f"Could not parse numeric part from quantity '{conf_value}'")
-                resolved_value = conf_value
-            elif isinstance(conf_value, (int, float)):
-                numeric_value = conf_value
-                resolved_value = f"{conf_value}{default_unit}"
-            else:
-                raise ValueError(f"Value '{conf_value}' for quantity '{conf_param_name}' must be a number or string with units")
-
-            if min_val is not None and numeric_value < float(min_val):
-                raise ValueError(f"Value {conf_value} for '{conf_param_name}' is below minimum {min_val}")
-            if max_val is not None and numeric_value > float(max_val):
-                raise ValueError(f"Value {conf_value} for '{conf_param_name}' exceeds maximum {max_val}")
-
-        elif conf_param_type == "BTMConfigurationParameterBoolean":
-            if not isinstance(conf_value, bool):
-                raise ValueError(f"Value for boolean '{conf_param_name}' must be true or false")
-            resolved_value = conf_value
-
-        else:
-            raise ValueError(f"Unsupported parameter type '{conf_param_type}' for parameter '{conf_param_name}'")
+        resolved_value = entry["resolve"](conf_param_name, entry, conf_value)
 
         resolved_params.append({
-            "parameterId": param_id,
+            "parameterId": entry["param_id"],
             "parameterValue": resolved_value
         })
 
@@ -213,26 +508,46 @@ def resolve_configuration_parameters(config, config_schema):
 
 
 def get_part_id(ctx, partToExport, queryParam):
-    response = get_onshape_json(ctx, f"/parts/d/{{did}}/{{wvm}}/{{wvmid}}/e/{{eid}}?{queryParam}")
-    part_names = [part['name'] for part in response]
+    PID = _get_part_ids(ctx, queryParam).get(partToExport)
+    if PID is None:
+        raise ValueError(f"Part named '{partToExport}' not found in the Part Studio.")
+    return PID
+
+
+def _get_part_ids(ctx, queryParam):
+    # one (cached) parts listing per configuration serves the lookups of every exported part name
+    response = get_onshape_json(ctx, f"{ctx.url_parts}?{queryParam}", cache=True)
+    part_ids = {}
     for part in response:
-        if part['name'] == partToExport:
-            return part['partId']
-    raise ValueError(f"Part named '{partToExport}' not found in the Part Studio.")
+        part_ids.setdefault(part['name'], part['partId'])
+    return part_ids
 
 
 def encode_configuration_url(ctx, os_config_parameters):
-    response = post_onshape_json(ctx, "/elements/d/{did}/e/{eid}/configurationencodings",
-                                 {"parameters": os_config_parameters})
-    encodedId = response['encodedId']
-    queryParam = response['queryParam']
-    return encodedId, queryParam
+    # the payload is serialized once; the serialized form is both the request body and the cache key, so
+    # exports that resolve to the same parameters share one encoding request. The parameters are sorted so
+    # that the key order and spelling of the configuration file don't matter, and a request that is already
+    # in flight is waited for rather than sent again.
+    parameters = sorted(os_config_parameters, key=lambda parameter: parameter["parameterId"])
+    body = _dumps({"parameters": parameters})
+    with ctx.json_cache_lock:
+        encoding = ctx.encode_cache.get(body)
+        owner = encoding is None
+        if owner:
+            encoding = ctx.encode_cache[body] = Future()
+    if owner:
+        try:
+            response = post_onshape_json(ctx, ctx.url_encode, body=body)
+            encoding.set_result((response['encodedId'], response['queryParam']))
+        except Exception as e:
+            encoding.set_exception(e)
+    return encoding.result()
 
 
 def create_translation_request(ctx, encodedId, PID, formatName="STEP"):
     return post_onshape_json(
         ctx,
-        "/partstudios/d/{did}/{wv}/{wvid}/e/{eid}/translations",
+        ctx.url_translate,
         {
             "configuration": encodedId,
             "formatName": formatName,
@@ -242,39 +557,42 @@ def create_translation_request(ctx, encodedId, PID, formatName="STEP"):
     )['id']
 
 
-def wait_for_translation_request(ctx, TID):
-    while True:
-        time.sleep(5)
-        response = get_onshape_json(ctx, f"/translations/{TID}")
-        log("Translation status: " + response["requestState"], verbosity=ctx.verbosity, level=2)
-        if response["requestState"] == "DONE":
-            break
-    return response
-
-
 def download_external_data(ctx, FID, filename="result.step"):
-    url = f"https://cad.onshape.com/api/documents/d/{ctx.ids['did']}/externaldata/{FID}"
-    response = get_onshape_direct(ctx, url, headers={
-        "Accept": "application/octet-stream",
-        "Content-Type": "application/json"
-    })
-    with open(filename, 'wb') as f:
-        f.write(response.content)
+    url = f"{ctx.url_externaldata}/{FID}"
+    # stream the body straight to disk in chunks instead of holding the whole file in memory; it goes to a
+    # temporary file first so an interrupted transfer never leaves a truncated export behind
+    partial = f"{filename}.part"
+    with get_onshape_direct(ctx, url, headers={"Accept": "application/octet-stream"}, stream=True) as response:
+        response.raw.decode_content = True
+        try:
+            with open(partial, 'wb') as f:
+                shutil.copyfileobj(response.raw, f, length=1 << 16)
+                written = f.tell()
+            os.replace(partial, filename)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(partial)
+            raise
+        log("Downloaded %d bytes for %s (%d bytes transferred, Content-Encoding: %s)",
+            written, filename, response.raw.tell(), response.headers.get('Content-Encoding', 'none'),
+            verbosity=ctx.verbosity, level=2)
 
 
 
 def load_config_with_fallback(filename="onshape-exporter.conf"):
     if filename == "-":
         try:
-            return yaml.safe_load(sys.stdin)
+            return yaml.load(sys.stdin, Loader=YamlLoader)
         except yaml.YAMLError as e:
-            log_error(f"Failed to parse configuration from stdin: {e}")
+            log_error("Failed to parse configuration from stdin: %s", e)
             sys.exit(1)
     if not os.path.exists(filename):
-        log_error(f"Configuration file '{filename}' not found in current directory.")
+        log_error("Configuration file '%s' not found in current directory.", filename)
         sys.exit(1)
     with open(filename) as f:
-        return yaml.safe_load(f)
+        if filename.endswith(".json"):
+            return json.load(f)
+        return yaml.load(f, Loader=YamlLoader)
     
 def get_version_name(ctx):
     try:
@@ -282,47 +600,142 @@ def get_version_name(ctx):
         if not ctx.ids['wvm'] == "v":
             return None
         vid = ctx.ids.get("vid")
-        version_info_list = get_onshape_json(ctx, "/documents/d/{did}/versions")
-        version_entry = next((v for v in version_info_list if v["id"] == vid), None)
+        version_entry = None
+        offset = 0
+        while version_entry is None:
+            page = get_onshape_json(ctx, f"{ctx.url_versions}?offset={offset}&limit={VERSIONS_PAGE_SIZE}", cache=True)
+            version_entry = next((v for v in page if v["id"] == vid), None)
+            if len(page) < VERSIONS_PAGE_SIZE:
+                break
+            offset += VERSIONS_PAGE_SIZE
         if not version_entry:
             raise ValueError(f"Error generating the filename suffix. Version ID '{vid}' not found in the version list.")
         return version_entry["name"]
     except Exception as e:
-        log_error(e)
+        log_error("%s", e)
         return None
 
 def generate_file_suffix(ctx):
-    suffix = ""
     if ctx.ids['wvm'] == "v":
-        suffix += get_version_name(ctx)
-    else:
-        suffix += "wip"
-    return suffix
-
-def export_configuration(ctx, export, partName, config_schema, formatName, suffix):
+        # fall back to the version id if the name can't be looked up
+        return get_version_name(ctx) or ctx.ids['vid']
+    return "wip"
+
+def encode_configuration(ctx, resolved_params, exports):
+    #encode the resolved parameters so that they can be transported in GET and PUT requests; returns None
+    #(after logging the failure of each of the "exports" that use them) if that fails, so they can be skipped
+    log("Resolved parameters: %s", resolved_params, verbosity=ctx.verbosity, level=2)
     try:
-#        log(f"Exporting configuration: {export.get('name', '?')}", verbosity=ctx.verbosity, level=1)
-        log(f"Exporting config: {export}", verbosity=ctx.verbosity, level=1)
-        #resolve the GUI-visible names to the ids used internally in os
-        resolved_params = resolve_configuration_parameters(export["config"], config_schema)
-        log(f"Resolved parameters: {resolved_params}", verbosity=ctx.verbosity, level=2)
-        #encode the resolved parameters so that they can be transported in GET and PUT requests
         encodedId, queryParam = encode_configuration_url(ctx, resolved_params)
-        log(f"Encoded ID: {encodedId}", verbosity=ctx.verbosity, level=2)
-        log(f"Query Param: {queryParam}", verbosity=ctx.verbosity, level=2)
-        #find the internal name of the GUI-visible part name
-        PID = get_part_id(ctx, partName, queryParam=queryParam)
-        log(f"Part ID: {PID}", verbosity=ctx.verbosity, level=2)
-        #start translation
+    except Exception as e:
+        _log_export_failure(exports, e)
+        return None
+    log("Encoded ID: %s", encodedId, verbosity=ctx.verbosity, level=2)
+    log("Query Param: %s", queryParam, verbosity=ctx.verbosity, level=2)
+    return encodedId, queryParam
+
+def find_part_ids(ctx, parts, queryParam, exports):
+    #find the internal names of the GUI-visible part names in one configuration; parts that can't be found
+    #are left out, after logging the failure of each of the "exports" that use this configuration
+    part_ids = {}
+    for partName in parts:
+        try:
+            part_ids[partName] = get_part_id(ctx, partName, queryParam=queryParam)
+        except Exception as e:
+            _log_export_failure(exports, e)
+            continue
+        log("Part ID of %s: %s", partName, part_ids[partName], verbosity=ctx.verbosity, level=2)
+    return part_ids
+
+def _export_cache_path(ctx, encodedId, PID, formatName):
+    if not _cacheable(ctx):
+        return None
+    ids = ctx.ids
+    key = hashlib.sha256(f"{ids['did']}|{ids['wvmid']}|{ids['eid']}|{encodedId}|{PID}|{formatName}".encode()).hexdigest()
+    return os.path.join(ctx.cache_dir, "exports", key)
+
+
+def _copy_file(source, target):
+    # always a real copy, never a hard link: cache entries and user-visible outputs must not share an inode,
+    # or writing one would silently change the other. The copy goes to a temporary file first and replaces
+    # target atomically, so an existing target is swapped out rather than written into.
+    partial = f"{target}.part"
+    try:
+        shutil.copyfile(source, partial)
+        os.replace(partial, target)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(partial)
+        raise
+
+
+def _store_in_cache(ctx, cache_path, filename, encodedId, PID, formatName):
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        _copy_file(filename, cache_path)
+        with open(f"{cache_path}.json", 'w') as f:
+            json.dump({"ids": ctx.ids, "encodedId": encodedId, "partId": PID, "formatName": formatName,
+                       "stored": datetime.now().isoformat()}, f)
+    except OSError as e:
+        log_error("Failed to store %s in the cache: %s", filename, e)
+
+
+def _log_export_failure(exports, e):
+    # entries with the same name and configuration are one export as far as the user is concerned
+    for name in dict.fromkeys(export.get('name', '?') for export in exports):
+        log_error("Failed to export configuration '%s': %s", name, e)
+
+def _copy_to_duplicates(ctx, targets):
+    #exports that resolve to an identical translation get a copy of the one file that was produced
+    filename = targets[0][1]
+    for export, duplicate in targets[1:]:
+        if duplicate == filename:
+            continue
+        #a failed copy only affects that one export; the file it was copied from is fine
+        try:
+            _copy_file(filename, duplicate)
+        except OSError as e:
+            _log_export_failure([export], e)
+            continue
+        log("Copied %s", duplicate, verbosity=ctx.verbosity, level=1)
+
+def start_export(ctx, targets, encodedId, PID, formatName):
+    #Fan-out phase: start the translation shared by "targets", a list of (export, filename) that all resolve to
+    #the same configuration, part and format. Returns a Future of the translation status, or None if there is
+    #nothing left to wait for (restored from the cache, or failed and already logged).
+    filename = targets[0][1]
+    try:
+        for export, _ in targets:
+            log("Exporting configuration: %s", export.get('name', '?'), verbosity=ctx.verbosity, level=1)
+            log("config=%r", export, verbosity=ctx.verbosity, level=2)
+        cache_path = _export_cache_path(ctx, encodedId, PID, formatName)
+        if cache_path and os.path.exists(cache_path):
+            #exported before from the same immutable version, skip the translation altogether
+            _copy_file(cache_path, filename)
+            log("Restored %s from the cache", filename, verbosity=ctx.verbosity, level=1)
+            _copy_to_duplicates(ctx, targets)
+            return None
         TID = create_translation_request(ctx, encodedId, PID, formatName=formatName)
-        #poll until ready
-        status = wait_for_translation_request(ctx, TID)
+        #the supervisor polls it together with all the other outstanding translations
+        return ctx.supervisor.submit(TID, label=filename)
+    except Exception as e:
+        _log_export_failure([export for export, _ in targets], e)
+        return None
+
+def finish_export(ctx, translation, targets, encodedId, PID, formatName):
+    #Fan-in phase: download the result of a completed translation and hand it to every export that shares it
+    filename = targets[0][1]
+    try:
+        status = translation.result()
         FID = status['resultExternalDataIds'][0]
-        filename = f"{partName}-{export['name']}-{suffix}.{formatName.lower()}"
         download_external_data(ctx, FID, filename=filename)
-        log(f"Downloaded {filename}", verbosity=ctx.verbosity, level=1)
+        log("Downloaded %s", filename, verbosity=ctx.verbosity, level=1)
+        cache_path = _export_cache_path(ctx, encodedId, PID, formatName)
+        if cache_path:
+            _store_in_cache(ctx, cache_path, filename, encodedId, PID, formatName)
+        _copy_to_duplicates(ctx, targets)
     except Exception as e:
-        log_error(f"Failed to export configuration '{export.get('name', '?')}': {e}")
+        _log_export_failure([export for export, _ in targets], e)
 
 def main():
     parser = argparse.ArgumentParser(description="Export Onshape configurations")
@@ -331,9 +744,15 @@ def main():
     parser.add_argument("--url", help="Override the URL in config")
     parser.add_argument("--part", help="Override the part name in config")
     parser.add_argument("--profile", help="Override default_stack in API key config")
+    parser.add_argument("--refresh-schema", action="store_true", help="Ignore the cached configuration schema and fetch it again")
+    parser.add_argument("--cache-dir", help="Directory for cached schemas and exports of versions and microversions",
+                        default=os.path.expanduser("~/.cache/onshape-exporter"))
+    parser.add_argument("--no-cache", action="store_true", help="Don't read or write the on-disk cache")
+    parser.add_argument("-j", "--jobs", type=int, default=MAX_WORKERS, help="Number of exports to run concurrently")
     parser.add_argument("-v", "--verbose", action="store_true", help="Enable verbose output")
     parser.add_argument("--quiet", action="store_true", help="Suppress all output except errors")
     args = parser.parse_args()
+    setup_logging()
 
     API_ACCESS, API_SECRET = load_api_keys(args.keyfile, stack_override=args.profile)
     config_data = load_config_with_fallback(args.config)
@@ -365,30 +784,68 @@ def main():
 
 
     # the context include authentication and the document id, version/workspace/microversion IDs
-    ctx = Context(API_ACCESS, API_SECRET, get_ids(config_data["url"]), verbosity=verbosity)
-
-    suffix = generate_file_suffix(ctx)
-
-    # get the onshape-internal configuration schema values that API will mostly use 
-    # instead of the GUI-visible names
-    config_schema = get_element_configuration(ctx)
-
-    # Validate all configurations first
-    for export in configurationsToExport:
-        try:
-            resolve_configuration_parameters(export["config"], config_schema)
-        except ValueError as e:
-            log_error(f"Configuration '{export.get('name', '?')}' is invalid: {e}")
-            return
-
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        futures = []
-        for formatName in formats:
-            for partName in parts:
-                for export in configurationsToExport:
-                    futures.append(executor.submit(export_configuration, ctx, export, partName, config_schema, formatName, suffix))
-        for future in as_completed(futures):
-            future.result()
+    ctx = Context(API_ACCESS, API_SECRET, get_ids(config_data["url"]), verbosity=verbosity,
+                  refresh_schema=args.refresh_schema, workers=max(1, args.jobs),
+                  cache_dir=None if args.no_cache else args.cache_dir)
+    with contextlib.closing(ctx.session):
+        suffix = generate_file_suffix(ctx)
+
+        # get the onshape-internal configuration schema values that API will mostly use 
+        # instead of the GUI-visible names
+        compiled_schema = get_element_configuration(ctx)
+
+        # Validate all configurations first, resolving the GUI-visible names to the ids used internally in os.
+        # Identical configurations are resolved (and below, encoded) only once.
+        # An entry without a name can't be given a file name; like any other failed export it is skipped on its own.
+        exports = []
+        resolved = {}
+        exports_by_key = {}
+        for index, export in enumerate(configurationsToExport, 1):
+            if "name" not in export:
+                log_error("Failed to export configuration #%d: it has no 'name'", index)
+                continue
+            try:
+                key = json.dumps(export["config"], sort_keys=True)
+                exports.append((export, key))
+                exports_by_key.setdefault(key, []).append(export)
+                if key not in resolved:
+                    resolved[key] = resolve_configuration_parameters(export["config"], compiled_schema)
+            except (TypeError, ValueError) as e:
+                log_error("Configuration '%s' is invalid: %s", export.get('name', '?'), e)
+                return
+
+        job_count = len(formats) * len(parts) * len(exports)
+        with ThreadPoolExecutor(max_workers=max(1, min(ctx.workers, job_count))) as executor:
+            # the encoding depends only on the configuration, not on the part or format being exported
+            encodings = dict(zip(resolved, executor.map(lambda key: encode_configuration(ctx, resolved[key], exports_by_key[key]), resolved)))
+            encodings = {key: encoding for key, encoding in encodings.items() if encoding is not None}
+            # and the part ids only on the configuration and part
+            part_ids = dict(zip(encodings, executor.map(lambda key: find_part_ids(ctx, parts, encodings[key][1], exports_by_key[key]), encodings)))
+            # exports that resolve to an identical (encodedId, partId, format) translation share a single one
+            translations = {}
+            for formatName, partName, (export, key) in product(formats, parts, exports):
+                if partName not in part_ids.get(key, {}):
+                    continue
+                filename = f"{partName}-{export['name']}-{suffix}.{formatName.lower()}"
+                targets = translations.setdefault((encodings[key][0], part_ids[key][partName], formatName), [])
+                # entries with the same name and configuration produce the same file, which is written only once
+                if all(filename != target for _, target in targets):
+                    targets.append((export, filename))
+
+            try:
+                # start every translation first so that they are all in flight at the same time...
+                started = executor.map(lambda item: start_export(ctx, item[1], *item[0]), translations.items())
+                pending = {future: translation for translation, future in zip(translations, started) if future is not None}
+                # ...then download each one as soon as it is done; both phases log their own failures
+                downloads = [executor.submit(finish_export, ctx, future, translations[pending[future]], *pending[future])
+                             for future in as_completed(pending)]
+                for download in downloads:
+                    download.result()
+            except KeyboardInterrupt:
+                log_error("Interrupted, abandoning the remaining exports")
+                ctx.cancelled.set()
+                executor.shutdown(wait=True, cancel_futures=True)
+                raise
 
 
 if __name__ == "__main__":